@@ -1,11 +1,77 @@
-from typing import Callable, Optional, Any, List, Dict
+from typing import AsyncIterator, Callable, Optional, Any, List, Dict
 import asyncio
+from collections import OrderedDict
+from contextvars import ContextVar
+import copy
 from datetime import datetime
-import json
-from termcolor import colored
+from functools import lru_cache
+import hashlib
+import logging
+import os
+import orjson
 import tiktoken
+from openai.lib.streaming.chat import ChatCompletionStreamState
+from openai.types.chat import ChatCompletion
 from AsyncAgentic.Agents.BaseAgent import BaseAgent
 
+logger = logging.getLogger(__name__)
+
+# encode_batch starts a new thread pool on every call, which costs more than it saves on a normal
+# context of short messages, so only use it when there is a lot of text to tokenize
+_ENCODE_BATCH_MIN_CHARS = 200_000
+_ENCODE_THREADS = min(8, os.cpu_count() or 1)
+
+class _ColoredFormatter(logging.Formatter):
+    """color whole record by level, applied once per emitted record"""
+    COLORS = {
+        logging.DEBUG: "\033[36m",
+        logging.INFO: "\033[32m",
+        logging.WARNING: "\033[33m",
+        logging.ERROR: "\033[31m",
+    }
+
+    def format(self, record: logging.LogRecord) -> str:
+        color = self.COLORS.get(record.levelno)
+        message = super().format(record)
+        return f"{color}{message}\033[0m" if color else message
+
+# debug_print records go to their own logger so turning it on for one agent or call
+# does not change the level of the module logger, which belongs to the application
+_debug_print_logger = logging.getLogger(__name__ + ".debug_print")
+_debug_print_logger.setLevel(logging.DEBUG)
+_debug_print_logger.propagate = False
+_debug_print_handler = logging.StreamHandler()
+_debug_print_handler.setFormatter(_ColoredFormatter("%(message)s"))
+_debug_print_logger.addHandler(_debug_print_handler)
+
+# debug_print passed to send_message, scoped to that call and the tool tasks it starts
+_call_debug_print: ContextVar[bool] = ContextVar("debug_print", default=False)
+
+@lru_cache(maxsize=32)
+def _get_encoding(model: str) -> tiktoken.Encoding:
+    """Get tiktoken encoding for model, cached so BPE tables are only loaded once per model"""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+async def _await_task(task: asyncio.Task) -> Any:
+    """await already running task from a TaskGroup, cancelling the wrapper cancels the task too"""
+    return await task
+
+def _in_tool_call_order(tool_calls, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """put executed and unknown tool results back in the order the model made the tool calls"""
+    results_by_id = {result["tool_call_id"]: result for result in results}
+    return [results_by_id[tool_call.id] for tool_call in tool_calls if tool_call.id in results_by_id]
+
+class _AgentHistory(list):
+    """
+    message history built by the agent itself. the list returned in response["history"]["messages"] records
+    its length, passed back with that length it is not re-validated, otherwise it is validated like any history.
+    it is the agent's own list, do not mutate it, use get_history_copy for a list to edit.
+    """
+    validated_length: Optional[int] = None
+
 class AsyncOpenAISimpleAgent(BaseAgent):
     def __init__(
         self,
@@ -20,11 +86,14 @@ class AsyncOpenAISimpleAgent(BaseAgent):
         max_context_length: int = 100000,
         max_token_per_message: int = 5000,
         max_messages_in_context: int = 20,
+        recent_message_cache_buffer: Optional[int] = None, # drop history beyond max_messages_in_context in chunks of this many messages
         prompt_when_context_overflow: str = "Context is full, there for response is cut short , use whatever context is avalible and only responed whatever is left , do not extraplorate or assume the next context , rather explain user that query is broad and it will be helpful to do specific query",
         prompt_when_message_is_dropped: str = "Previous messages are dropped because of context overflow",
         manual_stop_signal_function : Optional[Callable[[Any, Any], bool]] = None,
         check_for_stop_signal_time: int = 3,
         hooks: Optional[Dict[str, Callable]] = None,
+        enable_response_cache: bool = False, # reuse final responses for identical requests instead of calling the api
+        response_cache_size: int = 1024,
         **kwargs
     ):
         super().__init__(
@@ -44,42 +113,66 @@ class AsyncOpenAISimpleAgent(BaseAgent):
         self.tool_registry = tool_registry or []
         self.execute_function_concurrently = execute_function_concurrently
         self._tool_map = {tool["name"]: tool for tool in self.tool_registry}
-        self._message_history = []  # Track complete conversation
+        # tools payload and system message never change, so build them once instead of every request
+        self._tools_payload = [{"type": "function", "function": tool["function_schema"]}
+                               for tool in self.tool_registry] or None
+        self._system_message = {"role": "system", "content": self.system_prompt}
+        self._message_history = _AgentHistory()  # Track complete conversation
         self.debug_print = debug_print
         self.prompt_when_context_overflow = prompt_when_context_overflow
+        # chunks bigger than the window would round the cut past the whole history
+        if recent_message_cache_buffer is not None and not 1 <= recent_message_cache_buffer <= max_messages_in_context:
+            raise ValueError("recent_message_cache_buffer must be between 1 and max_messages_in_context")
+        self.recent_message_cache_buffer = recent_message_cache_buffer
         self.prompt_when_message_is_dropped = prompt_when_message_is_dropped
+        self.response_cache_size = response_cache_size
+        self.enable_response_cache = enable_response_cache
+        self._response_cache: OrderedDict[bytes, ChatCompletion] = OrderedDict()
+
+    def _debug_enabled(self) -> bool:
+        """debug_print is on for this agent or call, or the application enabled debug on the module logger"""
+        return self.debug_print or _call_debug_print.get() or logger.isEnabledFor(logging.DEBUG)
+
+    def _debug(self, msg: str, *args):
+        """print with debug_print, otherwise a normal debug record of the module logger"""
+        if self.debug_print or _call_debug_print.get():
+            _debug_print_logger.debug(msg, *args)
+        else:
+            logger.debug(msg, *args)
 
     def _truncate_tokens(self, text: str, max_tokens: int) -> str:
         """Truncate text to max_tokens based on context handling method"""
         if self.context_handling_method.lower() == "accurate":
-            try:
-                # TODO: I SHOULD PROABALY SWITCH TO THREADS HERE. OR KEEP SIMPLE CONTEXT HANDLING ONLY.
-                encoding = tiktoken.encoding_for_model(self.model)
-            except KeyError:
-                encoding = tiktoken.get_encoding("gpt-4o")
+            # TODO: I SHOULD PROABALY SWITCH TO THREADS HERE. OR KEEP SIMPLE CONTEXT HANDLING ONLY.
+            encoding = _get_encoding(self.model)
             tokens = encoding.encode(text)
             if len(tokens) <= max_tokens:
                 return text
-            print(f"Truncating text from {len(tokens)} to {max_tokens} tokens")
+            self._debug("Truncating text from %d to %d tokens", len(tokens), max_tokens)
             truncated = encoding.decode(tokens[:max_tokens])
             return truncated + "\n[Context trimmed due to token limit]"
         else:
             # Simple method: 1 token = 4 characters
             if len(text) <= max_tokens * 4:
                 return text
-            print(f"Truncating text from {len(text)} to {max_tokens * 4} characters")
+            self._debug("Truncating text from %d to %d characters", len(text), max_tokens * 4)
             return text[:max_tokens * 4] + "\n[Context trimmed due to token limit]"
 
-    def _get_total_context_tokens(self, messages: List[Dict[str, str]]) -> int:
-        """Get total token count for all messages"""
+    def _get_message_token_counts(self, messages: List[Dict[str, str]]) -> List[int]:
+        """Get token count of every message, messages without content count as 0"""
+        texts = [msg.get("content") or "" for msg in messages]
         if self.context_handling_method.lower() == "accurate":
-            try:
-                encoding = tiktoken.encoding_for_model(self.model)
-            except KeyError:
-                encoding = tiktoken.get_encoding("gpt-4")
-            return sum(len(encoding.encode(msg["content"])) for msg in messages if msg.get("content"))
+            encoding = _get_encoding(self.model)
+            if sum(map(len, texts)) < _ENCODE_BATCH_MIN_CHARS:
+                return [len(encoding.encode(text)) for text in texts]
+            # tiktoken releases the GIL while encoding, so big contexts are tokenized in threads
+            return [len(tokens) for tokens in encoding.encode_batch(texts, num_threads=_ENCODE_THREADS)]
         else:
-            return sum(len(msg["content"]) // 4 for msg in messages if msg.get("content"))
+            return [len(text) // 4 for text in texts]
+
+    def _get_total_context_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """Get total token count for all messages"""
+        return sum(self._get_message_token_counts(messages))
 
     def _trim_context(self, messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
         trimmed_messages = []
@@ -94,12 +187,15 @@ class AsyncOpenAISimpleAgent(BaseAgent):
                 trimmed_messages.append(msg)
 
         messages_dropped = False
-        while self._get_total_context_tokens(trimmed_messages) > self.max_context_length:
+        # count once and subtract dropped messages instead of re-tokenizing the whole context every drop
+        token_counts = self._get_message_token_counts(trimmed_messages)
+        total_tokens = sum(token_counts)
+        while total_tokens > self.max_context_length:
             if len(trimmed_messages) <= 1: 
                 break
-            if self.debug_print:
-                print(colored("Dropping oldest message due to context overflow", 'red'))
+            self._debug("Dropping oldest message due to context overflow")
             trimmed_messages.pop(1)  # keep system message, drop oldest user/assistant message
+            total_tokens -= token_counts.pop(1)
             messages_dropped = True
 
         # If any trimming happened, add context overflow prompt to the last message
@@ -112,25 +208,45 @@ class AsyncOpenAISimpleAgent(BaseAgent):
 
         return trimmed_messages
 
+    def _window_history(self, history: list) -> list:
+        """
+        Drop oldest messages beyond max_messages_in_context in chunks of recent_message_cache_buffer,
+        so the start of the history (and prompt cache prefix) only moves once every buffer messages.
+        buffer <= max_messages_in_context, so at least max_messages_in_context - buffer + 1 messages are kept
+        """
+        if not self.recent_message_cache_buffer or len(history) <= self.max_messages_in_context:
+            return history
+        overflow = len(history) - self.max_messages_in_context
+        cut = -(-overflow // self.recent_message_cache_buffer) * self.recent_message_cache_buffer
+        # never start on tool results whose assistant tool_calls message was dropped
+        while cut < len(history) and history[cut]["role"] == "tool":
+            cut += 1
+        return history[cut:]
+
     def _prepare_messages(self, message: str, history: Optional[list] = None) -> List[Dict[str, str]]:
-        """Prepare messages for OpenAI API with context handling"""
-        messages = []
-        
-        if not history or history[0]["role"] != "system":
-            messages.append({"role": "system", "content": self.system_prompt})
-        
-        if history:
-            messages.extend(history)
-        
-        if not history or history[-1]["content"] != message:
-            messages.append({"role": "user", "content": message})
+        """
+        Prepare messages for OpenAI API with context handling
+        messages are always [system, *history, user] so consecutive requests share the same prefix
+        and provider prompt caching can reuse it. pass previous response["history"]["messages"]
+        (not "simplified") as history to keep that prefix.
+        """
+        history = history or []
+        if history and history[0]["role"] == "system":
+            messages = [history[0]]
+            history = history[1:]
+        else:
+            messages = [self._system_message]
+
+        messages.extend(self._window_history(history))
+        messages.append({"role": "user", "content": message})
         
         # Apply context handling
         messages = self._trim_context(messages)
         
-        if self.debug_print:
+        # counting tokens is not free, only do it when the debug record is actually emitted
+        if self._debug_enabled():
             total_tokens = self._get_total_context_tokens(messages)
-            print(colored(f"Total context tokens: {total_tokens}/{self.max_context_length}", 'cyan'))
+            self._debug("Total context tokens: %d/%d", total_tokens, self.max_context_length)
         
         return messages
 
@@ -140,11 +256,67 @@ class AsyncOpenAISimpleAgent(BaseAgent):
         history: Optional[list] = None,
         debug_print: bool = False
     ):
+        return await self._run_conversation(message, history, debug_print)
+
+    async def send_message_stream(
+        self,
+        message: str,
+        history: Optional[list] = None,
+        debug_print: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Same as send_message but streams the model responses
+        yields {"type": "content", "content": str} as tokens arrive and finally
+        {"type": "response", "response": dict} with exactly what send_message would return.
+        with execute_function_concurrently every tool call starts as soon as it is fully generated,
+        while the rest of the response is still streaming.
+        """
+        events = asyncio.Queue()
+        task = asyncio.create_task(self._run_conversation(
+            message,
+            history,
+            debug_print,
+            on_content=lambda content: events.put_nowait({"type": "content", "content": content})
+        ))
+        try:
+            while True:
+                getter = asyncio.ensure_future(events.get())
+                done, _ = await asyncio.wait([getter, task], return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    yield getter.result()
+                    continue
+                getter.cancel()
+                while not events.empty():
+                    yield events.get_nowait()
+                yield {"type": "response", "response": task.result()}
+                return
+        finally:
+            # consumer stopped iterating early, dont leave the conversation running
+            if not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+
+    async def _run_conversation(
+        self,
+        message: str,
+        history: Optional[list] = None,
+        debug_print: bool = False,
+        on_content: Optional[Callable[[str], None]] = None
+    ):
+        """run model and tool turns until final response, streams model responses when on_content is given"""
+        debug_print_token = _call_debug_print.set(debug_print)
         try:
             safe_history = self._validate_history(history)
             self._message_history = safe_history
-            
-            self._add_to_history({
+
+            messages = self._prepare_messages(message, safe_history)
+            # bind appends once, every message below goes to both history and the request messages
+            history_append = self._message_history.append
+            messages_append = messages.append
+            history_append({
                 "role": "user",
                 "content": message
             })
@@ -152,67 +324,70 @@ class AsyncOpenAISimpleAgent(BaseAgent):
             await self._trigger_hook("on_before_request", {
                 "message": message,
                 "user_id": self.user_id,
-                "chat_id": self.chat_id,
-                "timestamp": datetime.now().isoformat()
+                "chat_id": self.chat_id
             })
 
-            messages = self._prepare_messages(message, self._message_history)
-            tools = [{"type": "function", "function": tool["function_schema"]} 
-                    for tool in self.tool_registry]
+            tools = self._tools_payload
 
             while True:  # continue until we get a response without tool calls
-                if debug_print:
-                    print(colored(f"Sending messages to OpenAI: {messages}", 'cyan'))
-
-                result, was_stopped = await self._run_with_stop_handler(
-                    self.client.send_message,
-                    messages=messages,
-                    model=self.model,
-                    tools=tools if tools else None,
-                    user_id=self.user_id,
-                    chat_id=self.chat_id
-                )
+                if self._debug_enabled():
+                    self._debug("Sending %d messages to OpenAI: %s", len(messages), messages)
+
+                cache_key = self._get_response_cache_key(messages) if self.enable_response_cache else None
+                # tool calls already started while streaming, by tool_call id
+                started_tools = {} if on_content is not None and self.execute_function_concurrently else None
+                if cache_key is not None and cache_key in self._response_cache:
+                    self._response_cache.move_to_end(cache_key)
+                    # no tokens are spent on a cache hit, so dont report the usage of the original request again
+                    result, was_stopped = self._response_cache[cache_key].model_copy(update={"usage": None}), False
+                    if on_content is not None and result.choices[0].message.content:
+                        on_content(result.choices[0].message.content)
+                elif on_content is not None:
+                    result, was_stopped = await self._run_with_stop_handler(
+                        self._stream_completion,
+                        messages,
+                        on_content,
+                        started_tools
+                    )
+                else:
+                    result, was_stopped = await self._run_with_stop_handler(
+                        self.client.send_message,
+                        messages=messages,
+                        model=self.model,
+                        tools=tools,
+                        user_id=self.user_id,
+                        chat_id=self.chat_id
+                    )
 
                 if was_stopped:
                     await self._trigger_hook("on_manual_stop", {
                         "user_id": self.user_id,
-                        "chat_id": self.chat_id,
-                        "timestamp": datetime.now().isoformat()
+                        "chat_id": self.chat_id
                     })
                     return self._format_response(result, stop_reason="manual_stop")
 
                 response = result
-                # if debug_print:
-                #     print(colored(f"Response: {response}", 'green'))
 
-                assistant_message = {
-                    "role": "assistant",
-                    "content": response.choices[0].message.content
-                }
-                if response.choices[0].message.tool_calls:
-                    assistant_message["tool_calls"] = [
-                        {
-                            "id": tool_call.id,
-                            "type": "function",
-                            "function": {
-                                "name": tool_call.function.name,
-                                "arguments": tool_call.function.arguments
-                            }
-                        } for tool_call in response.choices[0].message.tool_calls
-                    ]
-                self._add_to_history(assistant_message)
-                messages.append(assistant_message)
+                response_message = response.choices[0].message
+                tool_calls = response_message.tool_calls
+                assistant_message = self._build_assistant_message(response_message)
+                history_append(assistant_message)
+                messages_append(assistant_message)
 
                 # if no tool calls, we're done
-                if not response.choices[0].message.tool_calls:
+                if not tool_calls:
+                    if cache_key is not None:
+                        self._cache_response(cache_key, response)
                     break
 
-                tool_calls = response.choices[0].message.tool_calls
-                
+                # the next request cannot be pipelined with running tools, openai rejects a request unless
+                # every tool_call of the previous assistant message has its tool message. concurrent
+                # execution keeps the wait bounded by the slowest tool instead of the sum of all tools.
                 if self.execute_function_concurrently:
                     result, was_stopped = await self._run_with_stop_handler(
                         self._execute_tools_concurrent,
-                        tool_calls
+                        tool_calls,
+                        started_tools
                     )
                 else:
                     result, was_stopped = await self._run_with_stop_handler(
@@ -231,18 +406,18 @@ class AsyncOpenAISimpleAgent(BaseAgent):
                         "tool_call_id": result["tool_call_id"],
                         "content": str(result["result"])
                     }
-                    self._add_to_history(tool_message)
-                    messages.append(tool_message)
+                    history_append(tool_message)
+                    messages_append(tool_message)
 
-                if debug_print:
-                    for tool_call in tool_calls:
-                        print(colored(f"Executing {tool_call.function.name} with arguments: {tool_call.function.arguments}", 'yellow'))
+                if self._debug_enabled():
+                    self._debug("Executed tools: %s", ", ".join(
+                        f"{tool_call.function.name}({tool_call.function.arguments})" for tool_call in tool_calls
+                    ))
 
             await self._trigger_hook("on_after_request", {
                 "response": response,
                 "user_id": self.user_id,
-                "chat_id": self.chat_id,
-                "timestamp": datetime.now().isoformat()
+                "chat_id": self.chat_id
             })
 
             return self._format_response(response, stop_reason="completed")
@@ -251,37 +426,233 @@ class AsyncOpenAISimpleAgent(BaseAgent):
             await self._trigger_hook("on_error", {
                 "error": str(e),
                 "user_id": self.user_id,
-                "chat_id": self.chat_id,
-                "timestamp": datetime.now().isoformat()
+                "chat_id": self.chat_id
             })
             raise e
+        finally:
+            _call_debug_print.reset(debug_print_token)
 
-    async def _execute_tools_concurrent(self, tool_calls):
-        """execute multiple tool calls concurrently"""
-        tasks = []
+    async def _stream_completion(
+        self,
+        messages: List[Dict[str, Any]],
+        on_content: Callable[[str], None],
+        started_tools: Optional[Dict[str, asyncio.Task]] = None
+    ) -> ChatCompletion:
+        """
+        stream one completion and return it assembled, same as client.send_message would
+        content deltas go to on_content as they arrive. when started_tools is given every tool call
+        is started as soon as it is fully generated, a delta for tool call n means the ones before n are done.
+        """
+        state = ChatCompletionStreamState()
+        stream = await self.client.stream_message(
+            messages=messages,
+            model=self.model,
+            tools=self._tools_payload,
+            user_id=self.user_id,
+            chat_id=self.chat_id
+        )
+        try:
+            async for chunk in stream:
+                state.handle_chunk(chunk)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    on_content(delta.content)
+                if started_tools is not None and delta.tool_calls:
+                    generated = max(tool_call.index for tool_call in delta.tool_calls)
+                    snapshot_tool_calls = state.current_completion_snapshot.choices[0].message.tool_calls or []
+                    self._start_tools(snapshot_tool_calls[:generated], started_tools)
+
+            completion = state.get_final_completion()
+            if started_tools is not None:
+                self._start_tools(completion.choices[0].message.tool_calls or [], started_tools)
+            return completion
+        except BaseException:
+            tasks = list((started_tools or {}).values())
+            for task in tasks:
+                task.cancel()
+            # let the tools finish their cleanup before the conversation returns
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        finally:
+            await stream.close()
+
+    def _start_tools(self, tool_calls, started_tools: Dict[str, asyncio.Task]):
+        """start known tool calls which are not started yet"""
         for tool_call in tool_calls:
-            tool = self._tool_map.get(tool_call.function.name)
-            if tool:
-                tasks.append(self._execute_tool(tool, tool_call))
-        
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        for r in results:
-            if isinstance(r, Exception):
-                raise r
-        
+            if tool_call.id not in started_tools and tool_call.function.name in self._tool_map:
+                started_tools[tool_call.id] = asyncio.create_task(
+                    self._execute_tool(self._tool_map[tool_call.function.name], tool_call)
+                )
+
+    async def send_batch(
+        self,
+        messages: List[str],
+        histories: Optional[List[Optional[list]]] = None,
+        *,
+        use_batch_api: bool = False,
+        max_concurrency: int = 20
+    ) -> List[Dict[str, Any]]:
+        """
+        Send many independent messages, returns responses in same order as messages
+        by default every message runs through send_message concurrently, at most max_concurrency at a time.
+        use_batch_api=True sends them through OpenAI Batch API instead, half the price but can take up to 24h,
+        there is only one model call per message so tool calls are returned (stop_reason "tool_calls") not executed.
+        a failing message does not stop the others, its response has stop_reason "error" and the error under "error".
+        """
+        message_histories: List[Optional[list]] = [None] * len(messages) if histories is None else histories
+        if len(message_histories) != len(messages):
+            raise ValueError("histories must have same length as messages")
+
+        if use_batch_api:
+            return await self._send_batch_api(messages, message_histories)
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def send_one(message, history):
+            async with semaphore:
+                # send_message keeps the conversation on the agent, so every message gets its own shallow copy
+                agent = copy.copy(self)
+                agent._message_history = _AgentHistory()
+                try:
+                    return await agent.send_message(message, history)
+                except Exception as e:
+                    # on_error hook is already triggered by send_message
+                    response = agent._format_response(None, stop_reason="error")
+                    response["error"] = str(e)
+                    return response
+
+        return await asyncio.gather(*(send_one(message, history) for message, history in zip(messages, message_histories)))
+
+    async def _send_batch_api(self, messages: List[str], histories: List[Optional[list]]) -> List[Dict[str, Any]]:
+        """send every message as one request of a single OpenAI batch"""
+        agents = []
+        requests = []
+        for i, (message, history) in enumerate(zip(messages, histories)):
+            agent = copy.copy(self)
+            agent._message_history = agent._validate_history(history)
+            requests.append({
+                "custom_id": str(i),
+                "messages": agent._prepare_messages(message, agent._message_history)
+            })
+            agent._message_history.append({
+                "role": "user",
+                "content": message
+            })
+            agents.append(agent)
+            await self._trigger_hook("on_before_request", {
+                "message": message,
+                "user_id": self.user_id,
+                "chat_id": self.chat_id
+            })
+
+        batch_result, was_stopped = await self._run_with_stop_handler(
+            self.client.send_batch,
+            requests,
+            model=self.model,
+            tools=self._tools_payload
+        )
+
+        if was_stopped:
+            await self._trigger_hook("on_manual_stop", {
+                "user_id": self.user_id,
+                "chat_id": self.chat_id
+            })
+            return [agent._format_response(None, stop_reason="manual_stop") for agent in agents]
+
+        completions, errors = batch_result
+        results = []
+        for request, agent in zip(requests, agents):
+            response = completions.get(request["custom_id"])
+            if response is None:
+                # same shape as a failing message of the concurrent path
+                error = errors.get(request["custom_id"], "No result for this request")
+                await self._trigger_hook("on_error", {
+                    "error": error,
+                    "user_id": self.user_id,
+                    "chat_id": self.chat_id
+                })
+                error_response = agent._format_response(None, stop_reason="error")
+                error_response["error"] = error
+                results.append(error_response)
+                continue
+
+            response_message = response.choices[0].message
+            agent._message_history.append(self._build_assistant_message(response_message))
+            await self._trigger_hook("on_after_request", {
+                "response": response,
+                "user_id": self.user_id,
+                "chat_id": self.chat_id
+            })
+            stop_reason = "tool_calls" if response_message.tool_calls else "completed"
+            results.append(agent._format_response(response, stop_reason=stop_reason))
         return results
 
+    async def _resolve_tool_calls(self, tool_calls):
+        """
+        split tool calls into (tool, tool_call) pairs to execute and error results for unknown tools,
+        every tool_call still needs a tool message or the next request is rejected
+        """
+        pairs = [(self._tool_map[tool_call.function.name], tool_call)
+                 for tool_call in tool_calls if tool_call.function.name in self._tool_map]
+        unknown_results = []
+        for tool_call in tool_calls:
+            if tool_call.function.name in self._tool_map:
+                continue
+            error = f"Unknown function: {tool_call.function.name}"
+            await self._trigger_hook("on_function_call_error", {
+                "function": tool_call.function.name,
+                "error": error,
+                "user_id": self.user_id,
+                "chat_id": self.chat_id,
+                "agent_name": self.agent_name
+            })
+            unknown_results.append({
+                "tool_call_id": tool_call.id,
+                "name": tool_call.function.name,
+                "result": error
+            })
+        return pairs, unknown_results
+
+    async def _execute_tools_concurrent(self, tool_calls, started_tools: Optional[Dict[str, asyncio.Task]] = None):
+        """execute multiple tool calls concurrently, tool calls in started_tools are only awaited"""
+        started_tools = started_tools or {}
+        try:
+            pairs, unknown_results = await self._resolve_tool_calls(tool_calls)
+            try:
+                # TaskGroup cancels the remaining tools as soon as one of them fails
+                async with asyncio.TaskGroup() as tg:
+                    tasks = [
+                        tg.create_task(
+                            _await_task(started_tools[tool_call.id]) if tool_call.id in started_tools
+                            else self._execute_tool(tool, tool_call)
+                        )
+                        for tool, tool_call in pairs
+                    ]
+            except ExceptionGroup as eg:
+                raise eg.exceptions[0]
+        except BaseException:
+            # started tools only belong to the TaskGroup once it is entered, a stop while the
+            # unknown tool hooks run must not leave them running after the conversation returns
+            pending = [task for task in started_tools.values() if not task.done()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise
+
+        # keep tool_call order, not completion order, so history and prompt cache prefix stay deterministic
+        return _in_tool_call_order(tool_calls, [task.result() for task in tasks] + unknown_results)
+
     async def _execute_tools_sequential(self, tool_calls):
         """execute tool calls one at a time"""
+        pairs, unknown_results = await self._resolve_tool_calls(tool_calls)
         results = []
-        for tool_call in tool_calls:
-            tool = self._tool_map.get(tool_call.function.name)
-            if tool:
-                result = await self._execute_tool(tool, tool_call)
-                if result:
-                    results.append(result)
-        return results
+        for tool, tool_call in pairs:
+            result = await self._execute_tool(tool, tool_call)
+            if result:
+                results.append(result)
+        return _in_tool_call_order(tool_calls, results + unknown_results)
 
     async def _execute_tool(self, tool, tool_call):
         """execute a single tool"""
@@ -293,8 +664,8 @@ class AsyncOpenAISimpleAgent(BaseAgent):
         })
 
         try:
-            if isinstance(tool_call.function.arguments, str):
-                arguments = json.loads(tool_call.function.arguments)
+            if isinstance(tool_call.function.arguments, (str, bytes)):
+                arguments = orjson.loads(tool_call.function.arguments)
             else:
                 arguments = tool_call.function.arguments
 
@@ -336,6 +707,25 @@ class AsyncOpenAISimpleAgent(BaseAgent):
                 "result": str(e)
             }
 
+    def _build_assistant_message(self, response_message: Any) -> Dict[str, Any]:
+        """convert openai response message into assistant history message"""
+        assistant_message = {
+            "role": "assistant",
+            "content": response_message.content
+        }
+        if response_message.tool_calls:
+            assistant_message["tool_calls"] = [
+                {
+                    "id": tool_call.id,
+                    "type": "function",
+                    "function": {
+                        "name": tool_call.function.name,
+                        "arguments": tool_call.function.arguments
+                    }
+                } for tool_call in response_message.tool_calls
+            ]
+        return assistant_message
+
     def _format_tool_results(self, results: List[Dict[str, Any]]) -> List[Dict[str, str]]:
         """Format tool results for OpenAI API"""
         messages = []
@@ -360,24 +750,36 @@ class AsyncOpenAISimpleAgent(BaseAgent):
                 "content": str(result["result"])
             })
         
-        if self.debug_print:
-            print(colored(f"Formatted messages for OpenAI: {messages}", 'magenta'))
+        self._debug("Formatted messages for OpenAI: %s", messages)
         return messages
 
+    def _get_response_cache_key(self, messages: List[Dict[str, Any]]) -> bytes:
+        """hash everything that decides the response, model, temperature, messages and tools"""
+        payload = orjson.dumps(
+            [self.model, self.client.temperature, messages, self._tools_payload],
+            option=orjson.OPT_SORT_KEYS,
+            default=str
+        )
+        return hashlib.blake2b(payload, digest_size=16).digest()
+
+    def _cache_response(self, cache_key: bytes, response: ChatCompletion):
+        """store final response, evicting least recently used ones over response_cache_size"""
+        self._response_cache[cache_key] = response
+        self._response_cache.move_to_end(cache_key)
+        while len(self._response_cache) > self.response_cache_size:
+            self._response_cache.popitem(last=False)
+
     def _format_response(self, response: Any, stop_reason: str) -> Dict[str, Any]:
         """Format the final response with complete history"""
         complete_history = self._get_complete_history()
-        
-        clean_history = []
-        for msg in complete_history:
-            if msg["role"] == "user":
-                clean_history.append(msg)
-            elif msg["role"] == "assistant":
-                if msg.get("content"):
-                    clean_history.append({
-                        "role": "assistant",
-                        "content": msg["content"]
-                    })
+        complete_history.validated_length = len(complete_history)
+
+        # user messages as they are, assistant messages only with content and without tool_calls
+        clean_history = [
+            msg if msg["role"] == "user" else {"role": "assistant", "content": msg["content"]}
+            for msg in complete_history
+            if msg["role"] == "user" or (msg["role"] == "assistant" and msg.get("content"))
+        ]
 
         result = {
             "stop_reason": stop_reason,
@@ -395,25 +797,31 @@ class AsyncOpenAISimpleAgent(BaseAgent):
                 "usage": None
             })
         else:
+            usage = response.usage
             result.update({
                 "output": response.choices[0].message.content,
-                "usage": response.usage.model_dump()
+                "usage": usage.model_dump() if usage else None
             })
 
         return result
 
-    def _add_to_history(self, message: Dict[str, Any]):
-        """add message to history"""
-        self._message_history.append(message)
+    def _get_complete_history(self) -> _AgentHistory:
+        """get complete conversation history, this is the agent's own list so callers must not mutate it"""
+        return self._message_history
 
-    def _get_complete_history(self) -> List[Dict[str, Any]]:
-        """get complete conversation history"""
+    def get_history_copy(self) -> List[Dict[str, Any]]:
+        """get a copy of complete conversation history which is safe to mutate"""
         return self._message_history.copy()
 
-    def _validate_history(self, history: Optional[list]) -> list:
+    def _validate_history(self, history: Optional[list]) -> _AgentHistory:
         """validate and return safe history copy"""
         if not history:
-            return []
+            return _AgentHistory()
+
+        # history returned by the agent in response["history"]["messages"] is already valid,
+        # only copy it so this turn does not append into the previous response
+        if isinstance(history, _AgentHistory) and len(history) == history.validated_length:
+            return _AgentHistory(history)
         
         if not isinstance(history, list):
             raise ValueError("History must be a list")
@@ -426,4 +834,4 @@ class AsyncOpenAISimpleAgent(BaseAgent):
             if "content" not in msg:
                 raise ValueError("History messages must have 'content' field")
             
-        return history.copy()
+        return _AgentHistory(history)
@@ -1,4 +1,5 @@
 import asyncio
+from datetime import datetime
 from typing import Optional, Any, Callable, Dict, Tuple
 from abc import ABC, abstractmethod
 
@@ -22,7 +23,8 @@ class BaseAgent(ABC):
         max_token_per_message: int = 5000,
         max_messages_in_context: int = 20,
         temperature: float = 0.7,
-        hooks: Optional[Dict[str, Callable]] = None
+        hooks: Optional[Dict[str, Callable]] = None,
+        http2: bool = True
     ):
         # Validate required fields
         if not agent_name or not isinstance(agent_name, str):
@@ -57,12 +59,23 @@ class BaseAgent(ABC):
         self.client = AsyncOpenAIBase(
             api_key=api_key,
             base_url=base_url,
-            temperature=temperature
+            temperature=temperature,
+            http2=http2
         )
         
         # Event hooks
         self.hooks = hooks or {}
 
+    async def aclose(self):
+        """close the client connection pool, agent can not send messages after this"""
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
     @abstractmethod
     async def send_message(
         self,
@@ -74,8 +87,9 @@ class BaseAgent(ABC):
         pass
 
     async def _trigger_hook(self, hook_name: str, data: Dict[str, Any]):
-        """Trigger event hook if it exists"""
+        """Trigger event hook if it exists, timestamp is only added when hook is actually registered"""
         if hook_name in self.hooks:
+            data.setdefault("timestamp", datetime.now().isoformat())
             try:
                 await self.hooks[hook_name](data)
             except Exception as e:
@@ -1,8 +1,27 @@
 # This will be the base class for Async simple openai client
 
-from typing import Optional, Dict, Any, List
-from openai import AsyncOpenAI
-from openai.types.chat import ChatCompletion
+import asyncio
+from typing import Literal, Optional, Dict, Any, List, Tuple, cast
+import httpx
+import orjson
+from openai import NOT_GIVEN, AsyncOpenAI, AsyncStream, DefaultAsyncHttpxClient
+from openai.types.chat import (
+    ChatCompletion,
+    ChatCompletionChunk,
+    ChatCompletionMessageParam,
+    ChatCompletionToolChoiceOptionParam,
+    ChatCompletionToolParam,
+)
+
+def _batch_item_error(item: Dict[str, Any]) -> str:
+    """error message of a failed line of a batch output or error file"""
+    if item.get("error"):
+        return item["error"].get("message") or str(item["error"])
+    response = item.get("response") or {}
+    error = (response.get("body") or {}).get("error")
+    if error:
+        return error.get("message") or str(error)
+    return f"Request failed with status {response.get('status_code')}"
 
 class AsyncOpenAIBase:
     def __init__(
@@ -10,13 +29,31 @@ class AsyncOpenAIBase:
         api_key: str,
         base_url: str = "https://api.openai.com/v1",
         temperature: float = 0.7,
+        http2: bool = True,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 50,
+        keepalive_expiry: float = 30,
     ):
+        # one pooled client for every request of this agent, http2 multiplexes concurrent requests
+        # over one connection and longer keepalive keeps it open between tool call rounds
         self.client = AsyncOpenAI(
             api_key=api_key,
-            base_url=base_url
+            base_url=base_url,
+            http_client=DefaultAsyncHttpxClient(
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                    keepalive_expiry=keepalive_expiry
+                )
+            )
         )
         self.temperature = temperature
 
+    async def aclose(self):
+        """close the http connection pool"""
+        await self.client.close()
+
     async def send_message(
         self,
         messages: list[Dict[str, str]],
@@ -48,3 +85,103 @@ class AsyncOpenAIBase:
         except Exception as e:
             # Base error handling - agents will implement their retry logic
             raise e
+
+    async def stream_message(
+        self,
+        messages: list[Dict[str, str]],
+        model: str,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_choice: Optional[str] = "auto",
+        user_id: Any = None,
+        chat_id: Any = None,
+    ) -> AsyncStream[ChatCompletionChunk]:
+        """
+        Same as send_message but returns stream of chunks, last chunk carries the usage
+        """
+        # messages and tools are plain dicts, the sdk types are TypedDicts of the same shape,
+        # any mismatch makes the typed stream=True overload not match at all
+        return await self.client.chat.completions.create(
+            model=model,
+            messages=cast(List[ChatCompletionMessageParam], messages),
+            tools=cast(List[ChatCompletionToolParam], tools) if tools else NOT_GIVEN,
+            tool_choice=cast(ChatCompletionToolChoiceOptionParam, tool_choice) if tools and tool_choice else NOT_GIVEN,
+            temperature=self.temperature,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+
+    async def send_batch(
+        self,
+        requests: List[Dict[str, Any]],
+        model: str,
+        tools: Optional[List[Dict[str, Any]]] = None,
+        tool_choice: Optional[str] = "auto",
+        completion_window: Literal["24h"] = "24h",
+        poll_interval: float = 5,
+        max_poll_interval: float = 300,
+    ) -> Tuple[Dict[str, ChatCompletion], Dict[str, str]]:
+        """
+        Send chat requests through OpenAI Batch API, half the price but results come within completion_window
+        requests are {"custom_id": str, "messages": list}, returns (completions, errors) by custom_id,
+        every request is in exactly one of them.
+        """
+        lines = []
+        for request in requests:
+            body = {
+                "model": model,
+                "messages": request["messages"],
+                "temperature": self.temperature
+            }
+            if tools:
+                body["tools"] = tools
+                body["tool_choice"] = tool_choice
+            lines.append(orjson.dumps({
+                "custom_id": request["custom_id"],
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body
+            }))
+
+        batch_file = await self.client.files.create(file=("batch.jsonl", b"\n".join(lines)), purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window=completion_window
+        )
+
+        try:
+            delay = poll_interval
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_poll_interval)
+                batch = await self.client.batches.retrieve(batch.id)
+        except asyncio.CancelledError:
+            # stopped while waiting, dont leave the batch running (and billing) on openai side
+            await self.client.batches.cancel(batch.id)
+            raise
+
+        if batch.status == "failed":
+            raise RuntimeError(f"Batch {batch.id} failed: {batch.errors}")
+
+        results = {}
+        errors = {}
+        # successful and failed requests can be in either file, failed ones mostly go to the error file
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await self.client.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line:
+                    continue
+                item = orjson.loads(line)
+                response = item.get("response")
+                if response and response.get("status_code") == 200:
+                    results[item["custom_id"]] = ChatCompletion.model_validate(response["body"])
+                else:
+                    errors[item["custom_id"]] = _batch_item_error(item)
+
+        # expired or cancelled batches leave the remaining requests without any result
+        for request in requests:
+            if request["custom_id"] not in results and request["custom_id"] not in errors:
+                errors[request["custom_id"]] = f"Batch {batch.id} {batch.status} without a result for this request"
+        return results, errors
@@ -0,0 +1,99 @@
+import asyncio
+import json
+from datetime import datetime
+import os
+import time
+
+from AsyncAgentic.Agents import AsyncOpenAISimpleAgent
+
+async def get_current_time(user_id: str, chat_id: str, agent_name: str) -> str:
+    print(f"get_current_time called by {agent_name} for user {user_id} and chat {chat_id}")
+    return datetime.now().strftime("%H:%M:%S")
+
+async def get_weather(city: str, user_id: str, chat_id: str, agent_name: str) -> str:
+    print(f"get_weather called by {agent_name} for user {user_id} and chat {chat_id} at {datetime.now()}")
+    await asyncio.sleep(1)
+    return f"Sunny, 22°C in {city}"
+
+get_time_schema = {
+    "name": "get_current_time",
+    "description": "Get the current time",
+    "parameters": {
+        "type": "object",
+        "properties": {},
+        "required": []
+    }
+}
+
+get_weather_schema = {
+    "name": "get_weather",
+    "description": "Get weather for a city",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "city": {
+                "type": "string",
+                "description": "The city to get weather for"
+            }
+        },
+        "required": ["city"]
+    }
+}
+
+async def main():
+    async with AsyncOpenAISimpleAgent(
+        agent_name="Test_Agent",
+        agent_description="Test agent for weather and time",
+        model="gpt-4o-mini",
+        api_key=os.getenv("OPENAI_API_KEY"),
+        context_handling_method="simple",
+        max_context_length=25000,
+        max_token_per_message=4000,
+        user_id="test_user",
+        chat_id="test_chat",
+        tool_registry=[
+            {
+                "name": "get_current_time",
+                "function_schema": get_time_schema,
+                "func": get_current_time
+            },
+            {
+                "name": "get_weather",
+                "function_schema": get_weather_schema,
+                "func": get_weather
+            }
+        ],
+        execute_function_concurrently=True,
+        enable_response_cache=True,
+        system_prompt="You are a helpful assistant that can check time and weather"
+    ) as agent:
+        start_time = time.perf_counter()
+        print("\nTesting streaming with tool calls... tools start while the rest of response is still streaming")
+        async for event in agent.send_message_stream(
+            "What's the weather in Tokyo, London, Paris and Berlin? call the tool for every city."
+        ):
+            if event["type"] == "content":
+                print(event["content"], end="", flush=True)
+            else:
+                response = event["response"]
+        print()
+        print(json.dumps(response, indent=2))
+
+        print("\nTesting batch of independent messages...")
+        responses = await agent.send_batch(
+            ["What's the time?", "What's the weather in New York?", "Say hi"],
+            max_concurrency=2
+        )
+        for response in responses:
+            print(response["stop_reason"], response["output"])
+
+        print("\nTesting response cache... same message again should not hit the api")
+        cache_start = time.perf_counter()
+        response = await agent.send_message("Say hi")
+        print(response["output"], f"took {time.perf_counter() - cache_start} seconds")
+
+        end_time = time.perf_counter()
+        print(f"Total time taken: {end_time - start_time} seconds")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+# checks history windowing of recent_message_cache_buffer, no api key needed , nothing is sent to openai.
+from AsyncAgentic.Agents import AsyncOpenAISimpleAgent
+
+
+def make_agent(max_messages_in_context=4, recent_message_cache_buffer=3):
+    return AsyncOpenAISimpleAgent(
+        agent_name="Window_Agent",
+        agent_description="Test agent for history windowing",
+        model="gpt-4o-mini",
+        api_key="not-used",
+        user_id="test_user",
+        chat_id="test_chat",
+        max_messages_in_context=max_messages_in_context,
+        recent_message_cache_buffer=recent_message_cache_buffer,
+    )
+
+
+def user_messages(count):
+    return [{"role": "user", "content": str(i)} for i in range(count)]
+
+
+def test_cut_moves_in_chunks():
+    agent = make_agent(max_messages_in_context=4, recent_message_cache_buffer=3)
+    kept = {n: [m["content"] for m in agent._window_history(user_messages(n))] for n in range(3, 11)}
+    # nothing dropped until history is longer than max_messages_in_context
+    assert kept[3] == ["0", "1", "2"]
+    assert kept[4] == ["0", "1", "2", "3"]
+    # then start only moves every 3 messages, so prefix stays same for 3 turns
+    assert kept[5] == ["3", "4"]
+    assert kept[6] == ["3", "4", "5"]
+    assert kept[7] == ["3", "4", "5", "6"]
+    assert kept[8] == ["6", "7"]
+    # never keep less than max_messages_in_context - buffer + 1
+    assert all(len(messages) >= 2 for messages in kept.values())
+
+
+def test_buffer_equal_to_window_keeps_one_message():
+    agent = make_agent(max_messages_in_context=4, recent_message_cache_buffer=4)
+    assert [m["content"] for m in agent._window_history(user_messages(5))] == ["4"]
+
+
+def test_cut_skips_orphaned_tool_results():
+    agent = make_agent(max_messages_in_context=4, recent_message_cache_buffer=3)
+    history = [
+        {"role": "user", "content": "1"},
+        {"role": "assistant", "content": None, "tool_calls": []},
+        {"role": "user", "content": "2"},
+        {"role": "tool", "tool_call_id": "a", "content": "t"},
+        {"role": "tool", "tool_call_id": "b", "content": "t"},
+        {"role": "assistant", "content": "A"},
+        {"role": "user", "content": "3"},
+    ]
+    # cut lands on index 3 which is a tool result, it moves forward to the assistant message
+    assert [m["role"] for m in agent._window_history(history)] == ["assistant", "user"]
+
+
+def test_prepare_messages_keeps_system_and_new_user():
+    agent = make_agent(max_messages_in_context=4, recent_message_cache_buffer=3)
+    history = [{"role": "system", "content": "S"}] + user_messages(5)
+    messages = agent._prepare_messages("new", history)
+    assert [m["content"] for m in messages] == ["S", "3", "4", "new"]
+
+
+def test_buffer_bigger_than_window_is_rejected():
+    try:
+        make_agent(max_messages_in_context=4, recent_message_cache_buffer=10)
+    except ValueError:
+        return
+    raise AssertionError("recent_message_cache_buffer > max_messages_in_context must raise ValueError")
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name} passed")
@@ -0,0 +1,448 @@
+# checks streaming, batch and response cache against a fake client, no api key needed , nothing is sent to openai.
+import asyncio
+import logging
+import time
+from types import SimpleNamespace
+
+import orjson
+
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from AsyncAgentic.Agents import AsyncOpenAISimpleAgent
+from AsyncAgentic.OpenAIClientBase.AsyncOpenAIBase import AsyncOpenAIBase
+
+get_weather_schema = {
+    "name": "get_weather",
+    "description": "Get weather for a city",
+    "parameters": {
+        "type": "object",
+        "properties": {"city": {"type": "string"}},
+        "required": ["city"]
+    }
+}
+
+USAGE = {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+
+
+def completion(content=None, tool_calls=None) -> ChatCompletion:
+    return ChatCompletion.model_validate({
+        "id": "fake", "object": "chat.completion", "created": 0, "model": "fake",
+        "choices": [{
+            "index": 0,
+            "finish_reason": "tool_calls" if tool_calls else "stop",
+            "message": {"role": "assistant", "content": content, "tool_calls": tool_calls}
+        }],
+        "usage": USAGE,
+    })
+
+
+def chunk(delta=None, finish_reason=None, usage=None) -> ChatCompletionChunk:
+    data = {
+        "id": "fake", "object": "chat.completion.chunk", "created": 0, "model": "fake",
+        "choices": [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    if usage:
+        data["usage"] = usage
+    return ChatCompletionChunk.model_validate(data)
+
+
+def tool_call_delta(index, arguments, id=None, name=None):
+    delta = {"index": index, "function": {"arguments": arguments}}
+    if id:
+        delta.update(id=id, type="function")
+        delta["function"]["name"] = name
+    return delta
+
+
+def tool_calls_stream():
+    """two get_weather calls and an unknown one, followed by a slow tail"""
+    return [
+        chunk({"role": "assistant", "content": None}),
+        chunk({"tool_calls": [tool_call_delta(0, '{"city": ', id="call_tokyo", name="get_weather")]}),
+        chunk({"tool_calls": [tool_call_delta(0, '"Tokyo"}')]}),
+        chunk({"tool_calls": [tool_call_delta(1, '{}', id="call_unknown", name="unknown_tool")]}),
+        chunk({"tool_calls": [tool_call_delta(2, '{"city": "Paris"}', id="call_paris", name="get_weather")]}),
+        *[chunk({"content": None}) for _ in range(5)],
+        chunk({}, finish_reason="tool_calls"),
+        chunk(usage=USAGE),
+    ]
+
+
+def content_stream(*parts):
+    return [
+        chunk({"role": "assistant", "content": ""}),
+        *[chunk({"content": part}) for part in parts],
+        chunk({}, finish_reason="stop"),
+        chunk(usage=USAGE),
+    ]
+
+
+class FakeStream:
+    def __init__(self, chunks, delay):
+        self.chunks = chunks
+        self.delay = delay
+        self.finished_at = None
+
+    async def __aiter__(self):
+        for item in self.chunks:
+            await asyncio.sleep(self.delay)
+            yield item
+        self.finished_at = time.perf_counter()
+
+    async def close(self):
+        pass
+
+
+class FakeClient:
+    """stands in for AsyncOpenAIBase, returns scripted responses in order"""
+    def __init__(self, responses=None, streams=None, stream_delay=0.02):
+        self.temperature = 0.7
+        self.responses = list(responses or [])
+        self.streams = list(streams or [])
+        self.stream_delay = stream_delay
+        self.requests = []
+        self.opened_streams = []
+
+    async def send_message(self, messages, model, **kwargs):
+        self.requests.append(list(messages))
+        return self.responses.pop(0)
+
+    async def stream_message(self, messages, model, **kwargs):
+        self.requests.append(list(messages))
+        stream = FakeStream(self.streams.pop(0), self.stream_delay)
+        self.opened_streams.append(stream)
+        return stream
+
+    async def aclose(self):
+        pass
+
+
+def make_agent(client, tool_func=None, **kwargs):
+    async def get_weather(city, user_id, chat_id, agent_name):
+        await asyncio.sleep(0.1)
+        return f"Sunny in {city}"
+
+    agent = AsyncOpenAISimpleAgent(
+        agent_name="Fake_Agent",
+        agent_description="Test agent against fake client",
+        model="gpt-4o-mini",
+        api_key="not-used",
+        user_id="test_user",
+        chat_id="test_chat",
+        tool_registry=[{
+            "name": "get_weather",
+            "function_schema": get_weather_schema,
+            "func": tool_func or get_weather
+        }],
+        **kwargs
+    )
+    agent.client = client
+    return agent
+
+
+async def collect(agent, message, history=None):
+    contents = []
+    response = None
+    async for event in agent.send_message_stream(message, history):
+        if event["type"] == "content":
+            contents.append(event["content"])
+        else:
+            response = event["response"]
+    return contents, response
+
+
+def test_stream_starts_tools_before_stream_finishes():
+    async def run():
+        client = FakeClient(streams=[tool_calls_stream(), content_stream("Sun", "ny")])
+        started = {}
+
+        async def on_start(data):
+            started.setdefault(data["function"], time.perf_counter())
+
+        agent = make_agent(client, hooks={"on_function_call_start": on_start})
+        contents, response = await collect(agent, "weather?")
+
+        assert "".join(contents) == "Sunny"
+        assert response["stop_reason"] == "completed"
+        assert response["output"] == "Sunny"
+        # tokyo is complete once the delta of the next tool call arrives, long before the stream ends
+        assert started["get_weather"] < client.opened_streams[0].finished_at
+        tool_messages = [m for m in response["history"]["messages"] if m["role"] == "tool"]
+        # tool messages follow the order of the tool calls, unknown tool included
+        assert [m["tool_call_id"] for m in tool_messages] == ["call_tokyo", "call_unknown", "call_paris"]
+        assert [m["content"] for m in tool_messages] == ["Sunny in Tokyo", "Unknown function: unknown_tool", "Sunny in Paris"]
+        # second request carries every tool result
+        assert [m["role"] for m in client.requests[1]][-4:] == ["assistant", "tool", "tool", "tool"]
+
+    asyncio.run(run())
+
+
+def test_manual_stop_cancels_started_tools():
+    async def run():
+        cancelled = []
+
+        async def slow_weather(city, user_id, chat_id, agent_name):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(city)
+                raise
+            return "never"
+
+        # chunks arrive every 0.05s, tokyo is running by the time stop fires, paris is last and waits for the stream end
+        stop_at = time.perf_counter() + 0.4
+
+        async def stop_signal(user_id, chat_id):
+            return time.perf_counter() >= stop_at
+
+        ended = []
+
+        async def on_end(data):
+            ended.append(data)
+
+        client = FakeClient(streams=[tool_calls_stream()], stream_delay=0.05)
+        agent = make_agent(
+            client,
+            tool_func=slow_weather,
+            manual_stop_signal_function=stop_signal,
+            check_for_stop_signal_time=0.02,
+            hooks={"on_function_call_end": on_end}
+        )
+        contents, response = await collect(agent, "weather?")
+
+        assert response["stop_reason"] == "manual_stop"
+        assert cancelled == ["Tokyo"]
+        assert ended == []
+
+    asyncio.run(run())
+
+
+def test_manual_stop_during_error_hook_cancels_started_tools():
+    async def run():
+        cancelled = []
+
+        async def slow_weather(city, user_id, chat_id, agent_name):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(city)
+                raise
+
+        async def slow_error_hook(data):
+            await asyncio.sleep(0.5)
+
+        # stream ends after ~0.24s, stop fires while the unknown tool hook runs and before the TaskGroup is entered
+        stop_at = time.perf_counter() + 0.35
+
+        async def stop_signal(user_id, chat_id):
+            return time.perf_counter() >= stop_at
+
+        client = FakeClient(streams=[tool_calls_stream()])
+        agent = make_agent(
+            client,
+            tool_func=slow_weather,
+            manual_stop_signal_function=stop_signal,
+            check_for_stop_signal_time=0.02,
+            hooks={"on_function_call_error": slow_error_hook}
+        )
+        contents, response = await collect(agent, "weather?")
+
+        assert response["stop_reason"] == "manual_stop"
+        assert sorted(cancelled) == ["Paris", "Tokyo"]
+
+    asyncio.run(run())
+
+
+def test_closing_stream_early_cancels_conversation():
+    async def run():
+        cancelled = []
+
+        async def slow_weather(city, user_id, chat_id, agent_name):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(city)
+                raise
+
+        client = FakeClient(streams=[content_stream("a", "b", "c")])
+        agent = make_agent(client, tool_func=slow_weather)
+        stream = agent.send_message_stream("hi")
+        first = await stream.__anext__()
+        await stream.aclose()
+        assert first == {"type": "content", "content": "a"}
+
+        client = FakeClient(streams=[tool_calls_stream()], stream_delay=0.05)
+        agent = make_agent(client, tool_func=slow_weather)
+        stream = agent.send_message_stream("hi")
+        # consumer waiting for the next event gets cancelled mid stream while tokyo is running
+        task = asyncio.create_task(stream.__anext__())
+        await asyncio.sleep(0.3)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert cancelled == ["Tokyo"]
+
+    asyncio.run(run())
+
+
+def test_send_batch_keeps_order_and_reports_errors():
+    async def run():
+        client = FakeClient()
+
+        async def send_message(messages, model, **kwargs):
+            await asyncio.sleep(0.05 if messages[-1]["content"] == "a" else 0)
+            if messages[-1]["content"] == "bad":
+                raise RuntimeError("boom")
+            return completion(f"answer {messages[-1]['content']}")
+
+        client.send_message = send_message
+        agent = make_agent(client)
+        responses = await agent.send_batch(["a", "bad", "c"], max_concurrency=2)
+
+        assert [r["stop_reason"] for r in responses] == ["completed", "error", "completed"]
+        assert [r["output"] for r in responses] == ["answer a", None, "answer c"]
+        assert responses[1]["error"] == "boom"
+        assert [m["content"] for m in responses[0]["history"]["messages"]] == ["a", "answer a"]
+        # every message ran on its own copy, agent itself has no conversation mixed in
+        assert agent._message_history == []
+
+    asyncio.run(run())
+
+
+def test_send_batch_rejects_histories_of_wrong_length():
+    async def run():
+        agent = make_agent(FakeClient())
+        for histories in ([], [None]):
+            try:
+                await agent.send_batch(["a", "b"], histories=histories)
+            except ValueError as e:
+                assert str(e) == "histories must have same length as messages"
+            else:
+                raise AssertionError(f"histories={histories} was accepted")
+
+    asyncio.run(run())
+
+
+def test_batch_api_reports_errors_like_concurrent_path():
+    async def run():
+        client = FakeClient()
+
+        async def send_batch(requests, model, tools=None):
+            return {"0": completion("ok")}, {"1": "invalid model"}
+
+        client.send_batch = send_batch
+        agent = make_agent(client)
+        responses = await agent.send_batch(["a", "b"], use_batch_api=True)
+
+        assert [r["stop_reason"] for r in responses] == ["completed", "error"]
+        assert responses[1]["error"] == "invalid model"
+        assert responses[1]["output"] is None
+
+    asyncio.run(run())
+
+
+def test_openai_base_send_batch_reads_error_file():
+    async def run():
+        files = {
+            "out": [{"custom_id": "0", "response": {"status_code": 200, "body": completion("ok").model_dump()}}],
+            "err": [{"custom_id": "1", "response": {"status_code": 400, "body": {"error": {"message": "bad request"}}}}],
+        }
+
+        async def create_file(file, purpose):
+            return SimpleNamespace(id="input")
+
+        async def file_content(file_id):
+            return SimpleNamespace(text="\n".join(orjson.dumps(item).decode() for item in files[file_id]))
+
+        async def create_batch(**kwargs):
+            return SimpleNamespace(id="batch", status="expired", output_file_id="out", error_file_id="err")
+
+        base = AsyncOpenAIBase.__new__(AsyncOpenAIBase)
+        base.temperature = 0.7
+        base.client = SimpleNamespace(
+            files=SimpleNamespace(create=create_file, content=file_content),
+            batches=SimpleNamespace(create=create_batch),
+        )
+        requests = [{"custom_id": str(i), "messages": [{"role": "user", "content": "hi"}]} for i in range(3)]
+        completions, errors = await base.send_batch(requests, model="gpt-4o-mini")
+
+        assert list(completions) == ["0"]
+        assert completions["0"].choices[0].message.content == "ok"
+        assert errors["1"] == "bad request"
+        # never ran before the batch expired
+        assert errors["2"] == "Batch batch expired without a result for this request"
+
+    asyncio.run(run())
+
+
+def test_response_cache_skips_identical_request():
+    async def run():
+        client = FakeClient(responses=[completion("hi"), completion("other")])
+        agent = make_agent(client, enable_response_cache=True)
+
+        first = await agent.send_message("hello")
+        second = await agent.send_message("hello")
+        third = await agent.send_message("something else")
+
+        assert [first["output"], second["output"], third["output"]] == ["hi", "hi", "other"]
+        assert len(client.requests) == 2
+        # cache hit spent no tokens
+        assert first["usage"]["total_tokens"] == 2
+        assert second["usage"] is None
+
+    asyncio.run(run())
+
+
+def test_returned_history_is_validated_again_after_edits():
+    async def run():
+        client = FakeClient(responses=[completion("a"), completion("b")])
+        agent = make_agent(client)
+        response = await agent.send_message("hi")
+        history = response["history"]["messages"]
+
+        # unchanged history is passed back as is
+        second = await agent.send_message("again", history=history)
+        assert [m["content"] for m in second["history"]["messages"]] == ["hi", "a", "again", "b"]
+
+        edited = second["history"]["messages"]
+        edited.append({"content": "no role"})
+        try:
+            await agent.send_message("third", history=edited)
+        except ValueError as e:
+            assert str(e) == "History messages must have 'role' field"
+        else:
+            raise AssertionError("edited history was not validated")
+
+    asyncio.run(run())
+
+
+def test_debug_print_is_scoped_to_agent_and_call():
+    async def run():
+        printed = []
+        handler = logging.Handler()
+        handler.emit = lambda record: printed.append(record.getMessage())
+        debug_print_logger = logging.getLogger("AsyncAgentic.Agents.AsyncOpenAISimpleAgent.debug_print")
+        debug_print_logger.addHandler(handler)
+        try:
+            loud = make_agent(FakeClient(responses=[completion("a")]), debug_print=True)
+            quiet = make_agent(FakeClient(responses=[completion("b"), completion("c")]))
+
+            await loud.send_message("hi")
+            assert printed
+            printed.clear()
+            await quiet.send_message("hi")
+            assert printed == []
+            await quiet.send_message("hi again", debug_print=True)
+            assert printed
+            # application logging config is left alone
+            assert logging.getLogger("AsyncAgentic.Agents.AsyncOpenAISimpleAgent").level == logging.NOTSET
+        finally:
+            debug_print_logger.removeHandler(handler)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"{name} passed")